@@ -10,7 +10,7 @@ import uuid
 from datetime import datetime
 
 from database import get_db, engine, Base
-from models import Shipment, Port, Prediction, WeatherEvent, CongestionEvent, ChatLog
+from models import Shipment, Port, Prediction, WeatherEvent, CongestionEvent, ChatLog, ShadowPrediction
 from schemas import (
     ShipmentWithPrediction, Prediction as PredictionSchema,
     ChatMessage, ChatResponse, DashboardStats, Port as PortSchema
@@ -88,12 +88,55 @@ def get_ports(db: Session = Depends(get_db)):
     return db.query(Port).all()
 
 @app.post("/api/predictions/generate")
-def generate_predictions(db: Session = Depends(get_db)):
+def generate_predictions(shadow_version: str = None, db: Session = Depends(get_db)):
+    if shadow_version:
+        try:
+            predictor.load_shadow(shadow_version)
+        except KeyError:
+            raise HTTPException(status_code=404, detail=f"Unknown model version: {shadow_version}")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not predictor.load_model():
+            raise HTTPException(status_code=409, detail="Shadow scoring needs a serving model; activate or train one first")
+    
     try:
-        run_id = predictor.generate_predictions(db)
-        return {"status": "success", "run_id": run_id}
+        run_id = predictor.generate_predictions(db, shadow_version=shadow_version)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    result = {"status": "success", "run_id": run_id}
+    if shadow_version:
+        shadow_rows = db.query(ShadowPrediction).filter(ShadowPrediction.run_id == run_id).all()
+        result["shadow"] = {
+            "version": shadow_version,
+            "scored": len(shadow_rows),
+            "risk_level_disagreements": sum(1 for r in shadow_rows if r.risk_level != r.shadow_risk_level),
+            "mean_probability_diff": round(sum(
+                abs(r.delay_probability - r.shadow_delay_probability) for r in shadow_rows
+            ) / len(shadow_rows), 4) if shadow_rows else 0.0
+        }
+    return result
+
+@app.get("/api/models")
+def get_models():
+    return {
+        "versions": [
+            {"version": version, **predictor.registry.metadata(version)}
+            for version in predictor.registry.versions()
+        ],
+        "current": predictor.registry.current_version(),
+        **predictor.model_status()
+    }
+
+@app.post("/api/models/{version}/activate")
+def activate_model(version: str):
+    try:
+        predictor.activate(version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model version: {version}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "success", "serving": version}
 
 @app.post("/api/chat", response_model=ChatResponse)
 def chat(message: ChatMessage, db: Session = Depends(get_db)):
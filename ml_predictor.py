@@ -1,23 +1,74 @@
-import pickle
-import os
+import threading
 from datetime import datetime, timedelta
-from typing import List, Tuple
+from typing import List, NamedTuple, Optional
 import numpy as np
 from sklearn.ensemble import GradientBoostingClassifier
 from sklearn.preprocessing import StandardScaler
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from models import Shipment, WeatherEvent, CongestionEvent, Prediction, Port
+from models import Shipment, WeatherEvent, CongestionEvent, Prediction, Port, ShadowPrediction
+from weather_store import WeatherStore, event_fingerprint
+from route_lanes import LaneCache, CorridorExposure
+from model_registry import ModelRegistry
 import uuid
 
+N_FEATURES = 8
+
+def risk_level_for(delay_prob: float) -> str:
+    if delay_prob > 0.7:
+        return "high"
+    elif delay_prob > 0.4:
+        return "medium"
+    return "low"
+
+class WeatherSignals(NamedTuple):
+    max_wind: float
+    has_storm: bool
+    storm_type: Optional[str]
+    route_exposure: float
+    route_storm: Optional[str]
+
+class LoadedModel:
+    def __init__(self, version: str, model, scaler):
+        self.version = version
+        self.model = model
+        self.scaler = scaler
+        self.in_flight = 0
+    
+    def score(self, X: np.ndarray) -> np.ndarray:
+        return self.model.predict_proba(self.scaler.transform(X))[:, 1]
+
 class RiskPredictor:
-    def __init__(self):
-        self.model = None
-        self.scaler = None
-        self.model_path = "risk_model.pkl"
-        self.scaler_path = "scaler.pkl"
-        
-    def extract_features(self, shipment: Shipment, weather_events: List[WeatherEvent], 
-                        congestion: CongestionEvent = None, dest_port: Port = None) -> np.ndarray:
+    def __init__(self, registry: ModelRegistry = None):
+        self.registry = registry or ModelRegistry()
+        self.active: Optional[LoadedModel] = None
+        self.shadow: Optional[LoadedModel] = None
+        self.retired: List[LoadedModel] = []
+        self.rejected_versions = set()
+        self._lock = threading.Lock()
+        self.weather_window_hours = 24.0
+        self.weather: Optional[WeatherStore] = None
+        self._weather_lock = threading.Lock()
+        self.lanes = LaneCache()
+    
+    @property
+    def model(self):
+        return self.active.model if self.active else None
+    
+    @property
+    def scaler(self):
+        return self.active.scaler if self.active else None
+        
+    def weather_signals(self, shipment: Shipment, weather: WeatherStore, dest_port: Port = None,
+                        corridor: CorridorExposure = None) -> WeatherSignals:
+        max_wind, has_storm, storm_type = 0.0, False, None
+        if dest_port:
+            max_wind, has_storm, storm_type = weather.query(dest_port.id, shipment.eta_planned)
+        route_exposure, route_storm = corridor.exposure(shipment) if corridor else (0.0, None)
+        return WeatherSignals(max_wind, has_storm, storm_type, route_exposure, route_storm)
+    
+    def extract_features(self, shipment: Shipment, signals: WeatherSignals, 
+                        congestion: CongestionEvent = None) -> np.ndarray:
         features = []
         
         features.append(shipment.route_distance_nm / 10000.0)
@@ -27,15 +78,8 @@ class RiskPredictor:
         
         features.append(shipment.value_usd / 1000000.0)
         
-        nearby_weather = [w for w in weather_events 
-                         if dest_port and abs(w.latitude - dest_port.latitude) < 5 
-                         and abs(w.longitude - dest_port.longitude) < 5]
-        
-        max_wind = max([w.wind_speed_kts for w in nearby_weather], default=0)
-        features.append(max_wind / 100.0)
-        
-        has_storm = any(w.storm_flag for w in nearby_weather)
-        features.append(1.0 if has_storm else 0.0)
+        features.append(signals.max_wind / 100.0)
+        features.append(1.0 if signals.has_storm else 0.0)
         
         congestion_hours = congestion.avg_wait_hours if congestion else 0
         features.append(congestion_hours / 48.0)
@@ -43,11 +87,19 @@ class RiskPredictor:
         congestion_queue = congestion.queue_length if congestion else 0
         features.append(congestion_queue / 50.0)
         
+        features.append(signals.route_exposure)
+        
         return np.array(features).reshape(1, -1)
     
-    def train_model(self, db: Session):
+    def train_model(self, db: Session, activate: bool = True) -> str:
         shipments = db.query(Shipment).all()
         weather_events = db.query(WeatherEvent).all()
+        ports = db.query(Port).all()
+        # Training needs the full history, so nothing is evicted from this store.
+        weather = WeatherStore.from_events(
+            weather_events, ports, window_hours=self.weather_window_hours, keep_history=True
+        )
+        corridor = CorridorExposure(self.lanes, ports, weather)
         
         X = []
         y = []
@@ -58,7 +110,8 @@ class RiskPredictor:
                 CongestionEvent.port_id == shipment.dest_port_id
             ).order_by(CongestionEvent.recorded_at.desc()).first()
             
-            features = self.extract_features(shipment, weather_events, congestion, dest_port)
+            signals = self.weather_signals(shipment, weather, dest_port, corridor)
+            features = self.extract_features(shipment, signals, congestion)
             X.append(features[0])
             
             is_delayed = False
@@ -73,94 +126,239 @@ class RiskPredictor:
         X = np.array(X)
         y = np.array(y)
         
-        self.scaler = StandardScaler()
-        X_scaled = self.scaler.fit_transform(X)
+        scaler = StandardScaler()
+        X_scaled = scaler.fit_transform(X)
         
-        self.model = GradientBoostingClassifier(
+        model = GradientBoostingClassifier(
             n_estimators=100,
             learning_rate=0.1,
             max_depth=3,
             random_state=42
         )
-        self.model.fit(X_scaled, y)
+        model.fit(X_scaled, y)
         
-        with open(self.model_path, 'wb') as f:
-            pickle.dump(self.model, f)
-        with open(self.scaler_path, 'wb') as f:
-            pickle.dump(self.scaler, f)
+        version = self.registry.publish(
+            model, scaler, {"samples": len(X), "n_features": N_FEATURES}, activate=activate
+        )
+        if activate:
+            self._swap(LoadedModel(version, model, scaler))
         
-        print(f"Model trained with {len(X)} samples")
-        return self.model
+        print(f"Model {version} trained with {len(X)} samples")
+        return version
     
-    def load_model(self):
-        if os.path.exists(self.model_path) and os.path.exists(self.scaler_path):
-            with open(self.model_path, 'rb') as f:
-                self.model = pickle.load(f)
-            with open(self.scaler_path, 'rb') as f:
-                self.scaler = pickle.load(f)
-            return True
-        return False
+    def _read_version(self, version: str) -> Optional[LoadedModel]:
+        try:
+            model, scaler = self.registry.load(version)
+        except FileNotFoundError as e:
+            print(f"Could not load model {version}: {e}")
+            return None
+        except Exception as e:
+            # Unreadable pickles (e.g. from an incompatible scikit-learn) won't get
+            # better on retry, so stop reloading them on every request.
+            print(f"Could not load model {version}: {e}")
+            self.rejected_versions.add(version)
+            return None
+        
+        if getattr(scaler, "n_features_in_", N_FEATURES) != N_FEATURES:
+            print(f"Model {version} expects {scaler.n_features_in_} features, "
+                  f"current feature set has {N_FEATURES}; retrain with train_model.py")
+            self.rejected_versions.add(version)
+            return None
+        return LoadedModel(version, model, scaler)
     
-    def predict_risk(self, shipment: Shipment, weather_events: List[WeatherEvent], 
-                    congestion: CongestionEvent, dest_port: Port) -> Tuple[float, float, str]:
-        if not self.model or not self.scaler:
-            if not self.load_model():
-                return 0.5, 24.0, "medium"
+    def _swap(self, loaded: LoadedModel):
+        with self._lock:
+            old = self.active
+            if old and old.version == loaded.version:
+                return
+            self.active = loaded
+            if old and old.in_flight:
+                self.retired.append(old)
+        print(f"Serving model {loaded.version}")
+    
+    def load_model(self):
+        version = self.registry.current_version()
+        if version is None or version in self.rejected_versions:
+            return self.active is not None
         
-        features = self.extract_features(shipment, weather_events, congestion, dest_port)
-        features_scaled = self.scaler.transform(features)
+        active = self.active
+        if active and active.version == version:
+            return True
         
-        delay_prob = self.model.predict_proba(features_scaled)[0][1]
+        # Load outside the lock so in-flight runs keep scoring on the old version.
+        loaded = self._read_version(version)
+        if loaded is None:
+            return self.active is not None
+        self._swap(loaded)
+        return True
+    
+    def activate(self, version: str):
+        if version not in self.registry.versions():
+            raise KeyError(version)
+        loaded = self._read_version(version)
+        if loaded is None:
+            raise ValueError(f"Model {version} cannot be activated")
+        self.registry.activate(version)
+        self._swap(loaded)
+    
+    def acquire(self) -> Optional[LoadedModel]:
+        self.load_model()
+        with self._lock:
+            if self.active:
+                self.active.in_flight += 1
+            return self.active
+    
+    def release(self, loaded: LoadedModel):
+        with self._lock:
+            loaded.in_flight -= 1
+            if loaded.in_flight == 0 and loaded in self.retired:
+                self.retired.remove(loaded)
+    
+    def model_status(self) -> dict:
+        # Retired versions stay listed until their last in-flight run releases them.
+        with self._lock:
+            active = self.active
+            return {
+                "serving": active.version if active else None,
+                "serving_in_flight": active.in_flight if active else 0,
+                "retired": [{"version": m.version, "in_flight": m.in_flight} for m in self.retired]
+            }
+    
+    def load_shadow(self, version: str) -> LoadedModel:
+        shadow = self.shadow
+        if shadow and shadow.version == version:
+            return shadow
+        if version not in self.registry.versions():
+            raise KeyError(version)
+        shadow = None if version in self.rejected_versions else self._read_version(version)
+        if shadow is None:
+            raise ValueError(f"Model {version} cannot be used for shadow scoring")
+        self.shadow = shadow
+        return shadow
+    
+    def sync_weather(self, db: Session, ports: List[Port]) -> WeatherStore:
+        # The serving store lives across runs: each run reads the rows inside the
+        # forecast window, adds the ones it does not hold yet and drops the ones
+        # whose window has passed.
+        now = datetime.utcnow()
+        cutoff = now - timedelta(hours=self.weather_window_hours)
+        events = db.query(WeatherEvent).filter(
+            WeatherEvent.forecast_time >= cutoff
+        ).order_by(WeatherEvent.forecast_time).all()
+        max_id = db.query(func.max(WeatherEvent.id)).scalar() or 0
         
-        predicted_delay_hours = delay_prob * 48.0
+        weather = self.weather
+        if weather is not None:
+            weather.evict_expired(now)
+            current = {event.id: event_fingerprint(event) for event in events}
+            # Held rows that vanished or changed mean the table was edited or
+            # re-seeded, so the store no longer matches the database.
+            stale = (set(weather.buffers) != {p.id for p in ports}
+                     or max_id < weather.last_event_id
+                     or any(current.get(event_id) != held for event_id, held in weather.events.items()))
+            if stale:
+                print("Weather table changed underneath the serving store; rebuilding it")
+                weather = None
         
-        if delay_prob > 0.7:
-            risk_level = "high"
-        elif delay_prob > 0.4:
-            risk_level = "medium"
-        else:
-            risk_level = "low"
+        if weather is None:
+            weather = WeatherStore(ports, window_hours=self.weather_window_hours)
+            self.weather = weather
         
-        return delay_prob, predicted_delay_hours, risk_level
+        for event in events:
+            if event.id not in weather.events:
+                weather.add_event(event)
+        return weather
     
-    def generate_predictions(self, db: Session):
+    def generate_predictions(self, db: Session, shadow_version: str = None):
         shipments = db.query(Shipment).filter(Shipment.status.in_(["in_transit", "pending"])).all()
-        weather_events = db.query(WeatherEvent).all()
+        ports = db.query(Port).all()
         run_id = str(uuid.uuid4())[:8]
+        shadow = self.load_shadow(shadow_version) if shadow_version else None
+        if shadow and not self.load_model():
+            raise RuntimeError("Shadow scoring needs a serving model; activate or train one first")
         
-        for shipment in shipments:
-            dest_port = db.query(Port).filter(Port.id == shipment.dest_port_id).first()
-            congestion = db.query(CongestionEvent).filter(
-                CongestionEvent.port_id == shipment.dest_port_id
-            ).order_by(CongestionEvent.recorded_at.desc()).first()
-            
-            delay_prob, delay_hours, risk_level = self.predict_risk(
-                shipment, weather_events, congestion, dest_port
-            )
-            
-            risk_factors = []
-            if congestion and congestion.avg_wait_hours > 12:
-                risk_factors.append(f"Port congestion: {congestion.congestion_level}")
-            
-            nearby_storms = [w for w in weather_events 
-                           if w.storm_flag and dest_port
-                           and abs(w.latitude - dest_port.latitude) < 5]
-            if nearby_storms:
-                risk_factors.append(f"Weather: {nearby_storms[0].event_type}")
+        X = []
+        all_risk_factors = []
+        with self._weather_lock:
+            weather = self.sync_weather(db, ports)
+            corridor = CorridorExposure(self.lanes, ports, weather)
+            for shipment in shipments:
+                dest_port = db.query(Port).filter(Port.id == shipment.dest_port_id).first()
+                congestion = db.query(CongestionEvent).filter(
+                    CongestionEvent.port_id == shipment.dest_port_id
+                ).order_by(CongestionEvent.recorded_at.desc()).first()
+                
+                signals = self.weather_signals(shipment, weather, dest_port, corridor)
+                features = self.extract_features(shipment, signals, congestion)
+                X.append(features[0])
+                
+                risk_factors = []
+                if congestion and congestion.avg_wait_hours > 12:
+                    risk_factors.append(f"Port congestion: {congestion.congestion_level}")
+                
+                if signals.has_storm:
+                    risk_factors.append(f"Weather: {signals.storm_type}")
+                
+                if signals.route_exposure > 0:
+                    risk_factors.append(
+                        f"{signals.route_storm} along route ({signals.route_exposure*100:.0f}% of lane)"
+                    )
+                
+                if shipment.route_distance_nm > 8000:
+                    risk_factors.append("Long distance route")
+                
+                all_risk_factors.append(", ".join(risk_factors) if risk_factors else "Normal conditions")
+        
+        # The whole run is scored by the version active when it started, even if
+        # a new version is published meanwhile.
+        loaded = self.acquire()
+        try:
+            if shadow and loaded is None:
+                raise RuntimeError("Shadow scoring needs a serving model; activate or train one first")
+            X = np.array(X).reshape(-1, N_FEATURES)
+            if loaded is None or not len(X):
+                delay_probs = np.full(len(X), 0.5)
+            else:
+                delay_probs = loaded.score(X)
+            shadow_probs = shadow.score(X) if shadow and len(X) else None
             
-            if shipment.route_distance_nm > 8000:
-                risk_factors.append("Long distance route")
+            disagreements = 0
+            for i, shipment in enumerate(shipments):
+                delay_prob = float(delay_probs[i])
+                risk_level = risk_level_for(delay_prob)
+                prediction = Prediction(
+                    shipment_id=shipment.id,
+                    run_id=run_id,
+                    delay_probability=delay_prob,
+                    predicted_delay_hours=delay_prob * 48.0,
+                    risk_level=risk_level,
+                    risk_factors=all_risk_factors[i]
+                )
+                db.add(prediction)
+                
+                if shadow_probs is not None:
+                    shadow_prob = float(shadow_probs[i])
+                    shadow_risk_level = risk_level_for(shadow_prob)
+                    disagreements += shadow_risk_level != risk_level
+                    db.add(ShadowPrediction(
+                        shipment_id=shipment.id,
+                        run_id=run_id,
+                        model_version=loaded.version,
+                        shadow_version=shadow.version,
+                        delay_probability=delay_prob,
+                        shadow_delay_probability=shadow_prob,
+                        risk_level=risk_level,
+                        shadow_risk_level=shadow_risk_level
+                    ))
             
-            prediction = Prediction(
-                shipment_id=shipment.id,
-                run_id=run_id,
-                delay_probability=float(delay_prob),
-                predicted_delay_hours=float(delay_hours),
-                risk_level=risk_level,
-                risk_factors=", ".join(risk_factors) if risk_factors else "Normal conditions"
-            )
-            db.add(prediction)
-        
-        db.commit()
+            db.commit()
+        finally:
+            if loaded:
+                self.release(loaded)
+        
         print(f"Generated predictions for {len(shipments)} shipments (run_id: {run_id})")
+        if shadow_probs is not None:
+            mean_diff = float(np.abs(delay_probs - shadow_probs).mean())
+            print(f"Shadow {shadow.version} vs {loaded.version}: {disagreements} risk level "
+                  f"disagreements, mean probability difference {mean_diff:.3f}")
         return run_id
@@ -0,0 +1,88 @@
+import json
+import os
+import pickle
+import re
+import shutil
+import tempfile
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+VERSION_PATTERN = re.compile(r"^v(\d+)$")
+
+def _fsync_write(path: str, data: bytes):
+    with open(path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+class ModelRegistry:
+    # Each version is a directory that only becomes visible once fully written,
+    # and CURRENT is swapped with os.replace, so readers never see partial files.
+    def __init__(self, root: str = "registry"):
+        self.root = root
+        self.current_path = os.path.join(root, "CURRENT")
+
+    def versions(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        found = [name for name in os.listdir(self.root) if VERSION_PATTERN.match(name)]
+        return sorted(found, key=lambda name: int(VERSION_PATTERN.match(name).group(1)))
+
+    def current_version(self) -> Optional[str]:
+        try:
+            with open(self.current_path) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return version or None
+
+    def publish(self, model, scaler, metadata: dict = None, activate: bool = True) -> str:
+        os.makedirs(self.root, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=self.root)
+        try:
+            _fsync_write(os.path.join(staging, "risk_model.pkl"), pickle.dumps(model))
+            _fsync_write(os.path.join(staging, "scaler.pkl"), pickle.dumps(scaler))
+            meta = dict(metadata or {})
+            meta["published_at"] = datetime.utcnow().isoformat()
+            _fsync_write(os.path.join(staging, "meta.json"), json.dumps(meta, indent=2).encode())
+
+            while True:
+                existing = self.versions()
+                next_number = int(existing[-1][1:]) + 1 if existing else 1
+                version = f"v{next_number:04d}"
+                try:
+                    os.rename(staging, os.path.join(self.root, version))
+                    break
+                except OSError:
+                    if not os.path.isdir(os.path.join(self.root, version)):
+                        raise
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        if activate:
+            self.activate(version)
+        return version
+
+    def activate(self, version: str):
+        if not os.path.isdir(os.path.join(self.root, version)):
+            raise ValueError(f"Unknown model version: {version}")
+        fd, tmp_path = tempfile.mkstemp(prefix=".CURRENT-", dir=self.root)
+        os.close(fd)
+        _fsync_write(tmp_path, version.encode())
+        os.replace(tmp_path, self.current_path)
+
+    def load(self, version: str) -> Tuple[object, object]:
+        version_dir = os.path.join(self.root, version)
+        with open(os.path.join(version_dir, "risk_model.pkl"), 'rb') as f:
+            model = pickle.load(f)
+        with open(os.path.join(version_dir, "scaler.pkl"), 'rb') as f:
+            scaler = pickle.load(f)
+        return model, scaler
+
+    def metadata(self, version: str) -> dict:
+        try:
+            with open(os.path.join(self.root, version, "meta.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
@@ -51,7 +51,7 @@ class WeatherEvent(Base):
     wind_speed_kts = Column(Float)
     precipitation_mm = Column(Float)
     storm_flag = Column(Boolean, default=False)
-    forecast_time = Column(DateTime)
+    forecast_time = Column(DateTime, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
 class CongestionEvent(Base):
@@ -88,3 +88,17 @@ class ChatLog(Base):
     user_message = Column(Text)
     bot_response = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+class ShadowPrediction(Base):
+    __tablename__ = "shadow_predictions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    shipment_id = Column(Integer, ForeignKey("shipments.id"))
+    run_id = Column(String(50), index=True)
+    model_version = Column(String(20))
+    shadow_version = Column(String(20))
+    delay_probability = Column(Float)
+    shadow_delay_probability = Column(Float)
+    risk_level = Column(String(20))
+    shadow_risk_level = Column(String(20))
+    generated_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,109 @@
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from generate_data import calculate_distance
+from models import Port, Shipment
+from weather_store import WeatherStore, to_timestamp
+
+EARTH_RADIUS_NM = 3440.065
+
+class Lane:
+    def __init__(self, latitudes: np.ndarray, longitudes: np.ndarray,
+                 fractions: np.ndarray, distance_nm: float):
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.fractions = fractions
+        self.distance_nm = distance_nm
+
+def build_lane(origin: Port, dest: Port, step_nm: float = 100.0) -> Lane:
+    distance_nm = float(calculate_distance(origin.latitude, origin.longitude,
+                                           dest.latitude, dest.longitude))
+    n_samples = max(2, int(np.ceil(distance_nm / step_nm)) + 1)
+    fractions = np.linspace(0.0, 1.0, n_samples)
+
+    angle = distance_nm / EARTH_RADIUS_NM
+    if angle < 1e-9:
+        latitudes = np.full(n_samples, origin.latitude)
+        longitudes = np.full(n_samples, origin.longitude)
+        return Lane(latitudes, longitudes, fractions, distance_nm)
+
+    lat1, lon1, lat2, lon2 = map(np.radians, [origin.latitude, origin.longitude,
+                                               dest.latitude, dest.longitude])
+    start = np.array([np.cos(lat1) * np.cos(lon1), np.cos(lat1) * np.sin(lon1), np.sin(lat1)])
+    end = np.array([np.cos(lat2) * np.cos(lon2), np.cos(lat2) * np.sin(lon2), np.sin(lat2)])
+
+    a = np.sin((1 - fractions) * angle) / np.sin(angle)
+    b = np.sin(fractions * angle) / np.sin(angle)
+    points = a[:, None] * start + b[:, None] * end
+
+    latitudes = np.degrees(np.arctan2(points[:, 2], np.hypot(points[:, 0], points[:, 1])))
+    longitudes = np.degrees(np.arctan2(points[:, 1], points[:, 0]))
+    return Lane(latitudes, longitudes, fractions, distance_nm)
+
+class LaneCache:
+    # Lane geometry only depends on the two ports, so it is built once per pair.
+    def __init__(self, step_nm: float = 100.0):
+        self.step_nm = step_nm
+        self.lanes: Dict[Tuple[int, int], Lane] = {}
+
+    def get(self, origin: Port, dest: Port) -> Lane:
+        key = (origin.id, dest.id)
+        lane = self.lanes.get(key)
+        if lane is None:
+            lane = build_lane(origin, dest, self.step_nm)
+            self.lanes[key] = lane
+        return lane
+
+class CorridorExposure:
+    def __init__(self, lanes: LaneCache, ports: List[Port], weather: WeatherStore,
+                 radius_nm: float = 300.0):
+        self.lanes = lanes
+        self.ports = {p.id: p for p in ports}
+        self.window_seconds = weather.window_hours * 3600
+        self.radius_nm = radius_nm
+        self.storm_lats, self.storm_lons, self.storm_times, self.storm_types = weather.storm_arrays()
+        self.intersections: Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+
+    def _intersect(self, origin: Port, dest: Port) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        key = (origin.id, dest.id)
+        hit = self.intersections.get(key)
+        if hit is None:
+            lane = self.lanes.get(origin, dest)
+            # Weather at the ports themselves is covered by the destination features,
+            # so only the open-water part of the lane counts towards exposure.
+            from_origin = calculate_distance(lane.latitudes, lane.longitudes,
+                                             origin.latitude, origin.longitude)
+            from_dest = calculate_distance(lane.latitudes, lane.longitudes,
+                                           dest.latitude, dest.longitude)
+            route = (from_origin >= self.radius_nm) & (from_dest >= self.radius_nm)
+            latitudes, longitudes = lane.latitudes[route], lane.longitudes[route]
+
+            distances = calculate_distance(latitudes[:, None], longitudes[:, None],
+                                           self.storm_lats[None, :], self.storm_lons[None, :])
+            near = distances < self.radius_nm
+            columns = np.flatnonzero(near.any(axis=0))
+            hit = (columns, near[:, columns], lane.fractions[route])
+            self.intersections[key] = hit
+        return hit
+
+    def exposure(self, shipment: Shipment) -> Tuple[float, Optional[str]]:
+        origin = self.ports.get(shipment.origin_port_id)
+        dest = self.ports.get(shipment.dest_port_id)
+        if origin is None or dest is None or shipment.etd is None or shipment.eta_planned is None:
+            return 0.0, None
+
+        columns, near, fractions = self._intersect(origin, dest)
+        if not len(columns):
+            return 0.0, None
+
+        etd = to_timestamp(shipment.etd)
+        eta = to_timestamp(shipment.eta_planned)
+        passage_times = etd + fractions * (eta - etd)
+
+        in_window = np.abs(self.storm_times[columns][None, :] - passage_times[:, None]) <= self.window_seconds
+        exposed = near & in_window
+        exposed_samples = exposed.any(axis=1)
+        if not exposed_samples.any():
+            return 0.0, None
+
+        storm_type = self.storm_types[columns[np.flatnonzero(exposed.any(axis=0))[0]]]
+        return float(exposed_samples.mean()), storm_type
@@ -1,17 +1,26 @@
+import argparse
 from database import SessionLocal
 from ml_predictor import RiskPredictor
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shadow", action="store_true",
+                        help="publish without activating and score it alongside the serving model")
+    args = parser.parse_args()
+    
     db = SessionLocal()
     try:
         predictor = RiskPredictor()
+        if args.shadow and not predictor.load_model():
+            parser.error("--shadow needs a serving model to compare against; train without --shadow first")
         
         print("Training ML model...")
-        predictor.train_model(db)
-        print("Model trained successfully!")
+        version = predictor.train_model(db, activate=not args.shadow)
+        print(f"Model {version} trained successfully!")
         
         print("\nGenerating predictions...")
-        run_id = predictor.generate_predictions(db)
+        shadow_version = version if args.shadow else None
+        run_id = predictor.generate_predictions(db, shadow_version=shadow_version)
         print(f"Predictions generated successfully! (run_id: {run_id})")
     finally:
         db.close()
@@ -0,0 +1,202 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from models import WeatherEvent, Port
+
+EPOCH = datetime(1970, 1, 1)
+
+def to_timestamp(dt: datetime) -> float:
+    return (dt - EPOCH).total_seconds()
+
+def event_fingerprint(event: WeatherEvent) -> tuple:
+    return (to_timestamp(event.forecast_time), event.latitude, event.longitude,
+            event.wind_speed_kts, bool(event.storm_flag), event.event_type)
+
+class WeatherRingBuffer:
+    # Ring of weather observations kept sorted by forecast_time. Entries only
+    # leave through evict_before; a full buffer doubles its capacity rather
+    # than overwriting anything.
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.wind = np.zeros(capacity, dtype=np.float64)
+        self.storm = np.zeros(capacity, dtype=bool)
+        self.event_types: List[Optional[str]] = [None] * capacity
+        self.head = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def is_full(self) -> bool:
+        return self.size == self.capacity
+
+    def _segments(self) -> List[slice]:
+        end = self.head + self.size
+        if end <= self.capacity:
+            return [slice(self.head, end)]
+        return [slice(self.head, self.capacity), slice(0, end - self.capacity)]
+
+    def _grow(self):
+        segments = self._segments()
+        capacity = self.capacity * 2
+        times = np.zeros(capacity, dtype=np.float64)
+        wind = np.zeros(capacity, dtype=np.float64)
+        storm = np.zeros(capacity, dtype=bool)
+        times[:self.size] = np.concatenate([self.times[s] for s in segments])
+        wind[:self.size] = np.concatenate([self.wind[s] for s in segments])
+        storm[:self.size] = np.concatenate([self.storm[s] for s in segments])
+        event_types = [t for s in segments for t in self.event_types[s]]
+
+        self.times, self.wind, self.storm = times, wind, storm
+        self.event_types = event_types + [None] * (capacity - self.size)
+        self.capacity = capacity
+        self.head = 0
+
+    def append(self, forecast_ts: float, wind_speed: float, storm_flag: bool, event_type: str):
+        if self.is_full():
+            self._grow()
+
+        if self.size and forecast_ts < self.times[(self.head + self.size - 1) % self.capacity]:
+            self._insert_sorted(forecast_ts, wind_speed, storm_flag, event_type)
+            return
+
+        idx = (self.head + self.size) % self.capacity
+        self.times[idx] = forecast_ts
+        self.wind[idx] = wind_speed
+        self.storm[idx] = storm_flag
+        self.event_types[idx] = event_type
+        self.size += 1
+
+    def _insert_sorted(self, forecast_ts: float, wind_speed: float, storm_flag: bool, event_type: str):
+        segments = self._segments()
+        times = np.concatenate([self.times[s] for s in segments])
+        wind = np.concatenate([self.wind[s] for s in segments])
+        storm = np.concatenate([self.storm[s] for s in segments])
+        event_types = [t for s in segments for t in self.event_types[s]]
+
+        pos = int(np.searchsorted(times, forecast_ts, side="right"))
+        times = np.insert(times, pos, forecast_ts)
+        wind = np.insert(wind, pos, wind_speed)
+        storm = np.insert(storm, pos, storm_flag)
+        event_types.insert(pos, event_type)
+
+        n = len(times)
+        self.times[:n] = times
+        self.wind[:n] = wind
+        self.storm[:n] = storm
+        self.event_types[:n] = event_types
+        self.head = 0
+        self.size = n
+
+    def evict_before(self, cutoff_ts: float) -> int:
+        evicted = 0
+        for s in self._segments():
+            seg_times = self.times[s]
+            n = int(np.searchsorted(seg_times, cutoff_ts, side="left"))
+            evicted += n
+            if n < len(seg_times):
+                break
+
+        for i in range(evicted):
+            self.event_types[(self.head + i) % self.capacity] = None
+        self.head = (self.head + evicted) % self.capacity
+        self.size -= evicted
+        return evicted
+
+    def window(self, start_ts: float, end_ts: float) -> Tuple[float, bool, Optional[str]]:
+        max_wind = 0.0
+        has_storm = False
+        storm_type = None
+
+        for s in self._segments():
+            seg_times = self.times[s]
+            lo = int(np.searchsorted(seg_times, start_ts, side="left"))
+            hi = int(np.searchsorted(seg_times, end_ts, side="right"))
+            if lo >= hi:
+                continue
+
+            max_wind = max(max_wind, float(self.wind[s][lo:hi].max()))
+            storms = np.flatnonzero(self.storm[s][lo:hi])
+            if len(storms):
+                has_storm = True
+                if storm_type is None:
+                    storm_type = self.event_types[s][lo + storms[0]]
+
+        return max_wind, has_storm, storm_type
+
+class WeatherStore:
+    # keep_history=True keeps every event (used for training). Otherwise a full
+    # buffer first evicts expired events before it is allowed to grow.
+    def __init__(self, ports: List[Port], window_hours: float = 24.0,
+                 radius_deg: float = 5.0, capacity: int = 1024, keep_history: bool = False):
+        self.window_hours = window_hours
+        self.radius_deg = radius_deg
+        self.keep_history = keep_history
+        self.port_ids = np.array([p.id for p in ports], dtype=np.int64)
+        self.port_lats = np.array([p.latitude for p in ports], dtype=np.float64)
+        self.port_lons = np.array([p.longitude for p in ports], dtype=np.float64)
+        self.buffers: Dict[int, WeatherRingBuffer] = {
+            p.id: WeatherRingBuffer(capacity) for p in ports
+        }
+        self.storms: Dict[int, Tuple[float, float, float, str]] = {}
+        self.events: Dict[int, tuple] = {}
+        self.last_event_id = 0
+
+    @classmethod
+    def from_events(cls, weather_events: List[WeatherEvent], ports: List[Port], **kwargs) -> "WeatherStore":
+        store = cls(ports, **kwargs)
+        events = [w for w in weather_events if w.forecast_time is not None]
+        for event in sorted(events, key=lambda w: w.forecast_time):
+            store.add_event(event)
+        return store
+
+    def add_event(self, event: WeatherEvent):
+        self.last_event_id = max(self.last_event_id, event.id or 0)
+        if event.forecast_time is None:
+            return
+
+        forecast_ts = to_timestamp(event.forecast_time)
+        self.events[event.id] = event_fingerprint(event)
+        if event.storm_flag:
+            self.storms[event.id] = (event.latitude, event.longitude, forecast_ts, event.event_type)
+
+        nearby = ((np.abs(self.port_lats - event.latitude) < self.radius_deg)
+                  & (np.abs(self.port_lons - event.longitude) < self.radius_deg))
+        for port_id in self.port_ids[nearby]:
+            buf = self.buffers[int(port_id)]
+            if buf.is_full() and not self.keep_history:
+                self.evict_expired()
+                if buf.is_full():
+                    print(f"Weather buffer for port {port_id} is full of in-window events; "
+                          f"growing it to {buf.capacity * 2}")
+            buf.append(
+                forecast_ts, event.wind_speed_kts or 0.0, bool(event.storm_flag), event.event_type
+            )
+
+    def evict_expired(self, now: datetime = None) -> int:
+        now = now or datetime.utcnow()
+        cutoff_ts = to_timestamp(now - timedelta(hours=self.window_hours))
+        expired_storms = [event_id for event_id, storm in self.storms.items() if storm[2] < cutoff_ts]
+        for event_id in expired_storms:
+            del self.storms[event_id]
+        expired_events = [event_id for event_id, event in self.events.items() if event[0] < cutoff_ts]
+        for event_id in expired_events:
+            del self.events[event_id]
+        return sum(buf.evict_before(cutoff_ts) for buf in self.buffers.values())
+
+    def storm_arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[str]]:
+        storms = list(self.storms.values())
+        lats = np.array([s[0] for s in storms], dtype=np.float64)
+        lons = np.array([s[1] for s in storms], dtype=np.float64)
+        times = np.array([s[2] for s in storms], dtype=np.float64)
+        return lats, lons, times, [s[3] for s in storms]
+
+    def query(self, port_id: int, at: datetime) -> Tuple[float, bool, Optional[str]]:
+        buf = self.buffers.get(port_id)
+        if buf is None or at is None or not len(buf):
+            return 0.0, False, None
+
+        center = to_timestamp(at)
+        half_window = self.window_hours * 3600
+        return buf.window(center - half_window, center + half_window)